@@ -1,52 +1,158 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, BackgroundTasks
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, status
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import AsyncMongoClient, ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
 import os
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
 from typing import List, Optional
-import uuid
+import secrets
+import functools
+import hashlib
+import random
+import re
+import time
+import traceback
 from datetime import datetime, timezone, timedelta
 import jwt
+import aiohttp
 import bcrypt
+import fal_client
+import orjson
+import fastjsonschema
+from cachetools import TTLCache
 from google import genai
+from google.genai import types as genai_types
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+# Keep a few connections warm; cap the pool so bursts queue instead of flooding Mongo
+client = AsyncMongoClient(mongo_url, minPoolSize=5, maxPoolSize=50)
 db = client[os.environ['DB_NAME']]
 
+async def aggregate_list(collection, pipeline: list, length: Optional[int] = None) -> list:
+    """Run an aggregation pipeline and return its results as a list"""
+    cursor = await collection.aggregate(pipeline)
+    return await cursor.to_list(length)
+
+async def json_array(cursor, defaults: Optional[dict] = None):
+    """Yield a cursor as one orjson-encoded JSON array, a document at a time"""
+    defaults = defaults or {}
+    sep = b"["
+    async for doc in cursor:
+        yield sep + orjson.dumps({**defaults, **doc})
+        sep = b","
+    yield b"[]" if sep == b"[" else b"]"
+
+async def ndjson_lines(cursor, defaults: Optional[dict] = None):
+    """Yield each document from a cursor as an orjson-encoded NDJSON line"""
+    defaults = defaults or {}
+    async for doc in cursor:
+        yield orjson.dumps({**defaults, **doc}) + b"\n"
+
+# Short-lived cache of single prompt/video reads keyed (collection, id); writers call forget_doc.
+# Cached documents are shared between requests, so treat them as read-only.
+_DOC_CACHE = TTLCache(maxsize=4096, ttl=10)
+
+def forget_doc(collection: str, doc_id: str):
+    _DOC_CACHE.pop((collection, doc_id), None)
+
+async def find_owned_doc(collection: str, doc_id: str, user_id: str) -> Optional[dict]:
+    """Fetch a user's document by id, serving repeat reads from _DOC_CACHE"""
+    key = (collection, doc_id)
+    doc = _DOC_CACHE.get(key)
+    if doc is None or doc["user_id"] != user_id:
+        doc = await db[collection].find_one({"id": doc_id, "user_id": user_id}, {"_id": 0})
+        if doc:
+            _DOC_CACHE[key] = doc
+    return doc
+
+# Per-user dashboard stats, recomputed at most every 45s unless a write invalidates them
+_DASHBOARD_CACHE = TTLCache(maxsize=4096, ttl=45)
+
+def forget_dashboard(user_id: str):
+    _DASHBOARD_CACHE.pop(user_id, None)
+
+# Performance metrics per video (polled by the videos page) and video -> owner user_id.
+# Videos never change owner, so the owner map can live much longer than the metrics.
+_PERF_CACHE = TTLCache(maxsize=4096, ttl=15)
+_VIDEO_OWNER = TTLCache(maxsize=16384, ttl=3600)
+
+async def owns_video(video_id: str, user_id: str) -> bool:
+    """Ownership check that only hits Mongo for videos not seen recently"""
+    owner = _VIDEO_OWNER.get(video_id)
+    if owner is None:
+        video = await db.videos.find_one({"id": video_id}, {"_id": 0, "user_id": 1})
+        if not video:
+            return False
+        owner = _VIDEO_OWNER[video_id] = video["user_id"]
+    return owner == user_id
+
+async def update_video(video_id: str, user_id: str, fields: dict, claim: Optional[str] = None) -> bool:
+    """Set fields on a video and drop its cached copy and the owner's dashboard stats.
+    
+    With a claim token the write only applies while that claim still holds the video;
+    returns whether a video was matched.
+    """
+    query = {"id": video_id} if claim is None else {"id": video_id, "claim": claim}
+    result = await db.videos.update_one(query, {"$set": fields})
+    forget_doc("videos", video_id)
+    forget_dashboard(user_id)
+    return result.matched_count > 0
+
+def sse_event(event: str, data) -> bytes:
+    """Encode a server-sent event with an orjson payload"""
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', 'veoprompt-super-secret-key-2024')
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
 
+# Short-lived cache of token -> (user, exp) to skip JWT verification and the user lookup
+_JWT_CACHE = TTLCache(maxsize=10000, ttl=5)
+# In-flight token lookups, so concurrent cache misses for one token share a single lookup
+_JWT_INFLIGHT: dict = {}
+
+# bcrypt cost factor; existing hashes embed their own cost and keep verifying
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '10'))
+
+# bcrypt is CPU-bound; run it off the event loop so auth doesn't stall other requests
+BCRYPT_EXECUTOR = ThreadPoolExecutor(
+    max_workers=min(16, (os.cpu_count() or 1) * 2),
+    thread_name_prefix="bcrypt"
+)
+
 # Gemini API Key
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
+GEMINI_MODEL = 'gemini-2.0-flash-exp'
+# Identical prompt requests reuse a stored generation for this long
+PROMPT_CACHE_TTL_SECONDS = 7 * 24 * 3600
 
 # FAL AI Key for video generation
 FAL_KEY = os.environ.get('FAL_KEY', '')
 
-# Create videos directory
+# Videos directory (created on startup)
 VIDEOS_DIR = ROOT_DIR / 'videos'
-VIDEOS_DIR.mkdir(exist_ok=True)
 
 # Create the main app
-app = FastAPI(title="VeoPrompt - AI Video Prompt Generator")
+app = FastAPI(
+    title="VeoPrompt - AI Video Prompt Generator",
+    default_response_class=ORJSONResponse
+)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Security
-security = HTTPBearer()
-
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -55,6 +161,18 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def _new_id() -> str:
+    """Generate a document ID (128 random bits, base64url - no uuid4 formatting)"""
+    return secrets.token_urlsafe(16)
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+def _iso_utcnow() -> str:
+    """Current UTC time as the ISO string stored on documents"""
+    return datetime.now(timezone.utc).isoformat()
+
+
 # ==================== MODELS ====================
 
 class UserCreate(BaseModel):
@@ -98,7 +216,8 @@ class PromptGenerateRequest(BaseModel):
     goal: str = "engagement"  # engagement, virality, education, conversion
     custom_idea: Optional[str] = ""
 
-class PromptResponse(BaseModel):
+class PromptSummary(BaseModel):
+    """Prompt as shown in lists - everything except the raw LLM text"""
     model_config = ConfigDict(extra="ignore")
     id: str
     user_id: str
@@ -110,10 +229,12 @@ class PromptResponse(BaseModel):
     goal: str
     custom_idea: str
     generated_prompt: dict
-    raw_prompt_text: str
     created_at: str
     status: str  # draft, approved, generating, completed
 
+class PromptResponse(PromptSummary):
+    raw_prompt_text: str
+
 class VideoGenerateRequest(BaseModel):
     prompt_id: str
 
@@ -134,6 +255,14 @@ class VideoResponse(BaseModel):
     posted_at: Optional[str] = None
     platform: str = "instagram"
 
+# List queries fetch only the fields their response model returns
+PROMPT_LIST_PROJECTION = {"_id": 0, **dict.fromkeys(PromptSummary.model_fields, 1)}
+VIDEO_LIST_PROJECTION = {"_id": 0, **dict.fromkeys(VideoResponse.model_fields, 1)}
+# Optional fields a stored video may not have yet, filled in when streaming lists
+VIDEO_LIST_DEFAULTS = {
+    name: field.default for name, field in VideoResponse.model_fields.items() if not field.is_required()
+}
+
 class PerformanceMetrics(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str
@@ -152,6 +281,9 @@ class PerformanceUpdate(BaseModel):
     comments: Optional[int] = None
     watch_time_avg: Optional[float] = None
 
+class PerformanceBulkUpdate(PerformanceUpdate):
+    video_id: str
+
 class DashboardStats(BaseModel):
     total_prompts: int
     total_videos: int
@@ -164,31 +296,75 @@ class DashboardStats(BaseModel):
 # ==================== AUTH HELPERS ====================
 
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
 
 def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
+async def ahash_password(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(BCRYPT_EXECUTOR, hash_password, password)
+
+async def averify_password(password: str, hashed: str) -> bool:
+    return await asyncio.get_running_loop().run_in_executor(BCRYPT_EXECUTOR, verify_password, password, hashed)
+
+def hash_rounds(hashed: str) -> int:
+    """Cost factor of a bcrypt hash ($2b$<rounds>$...)"""
+    return int(hashed.split("$")[2])
+
+# Verified against when the email is unknown, so failed logins cost the same either way
+_DUMMY_PASSWORD_HASH = hash_password(secrets.token_hex(16))
+
 def create_token(user_id: str) -> str:
+    now = _utcnow()
     payload = {
         "sub": user_id,
-        "exp": datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION_HOURS),
-        "iat": datetime.now(timezone.utc)
+        "exp": now + timedelta(hours=JWT_EXPIRATION_HOURS),
+        "iat": now
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def bearer_token(authorization: Optional[str] = Header(None)) -> str:
+    """Pull the token out of a Bearer Authorization header without HTTPBearer's model plumbing"""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authenticated")
+    return token
+
+async def get_current_user(token: str = Depends(bearer_token)):
+    cached = _JWT_CACHE.get(token)
+    if cached is not None:
+        user, exp = cached
+        if exp > time.time():
+            return user
+        _JWT_CACHE.pop(token, None)
+        raise HTTPException(status_code=401, detail="Token expired")
+    
+    task = _JWT_INFLIGHT.get(token)
+    if task is None:
+        task = asyncio.ensure_future(_load_token_user(token))
+        _JWT_INFLIGHT[token] = task
+        task.add_done_callback(lambda _: _JWT_INFLIGHT.pop(token, None))
+    # Shield so one cancelled request doesn't cancel the lookup for the others
+    return await asyncio.shield(task)
+
+async def _load_token_user(token: str) -> dict:
+    """Verify a token, load its user and cache the result"""
     try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
         user_id = payload.get("sub")
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid token")
         
-        user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+        user = await db.users.find_one(
+            {"id": user_id},
+            {"_id": 0, "id": 1, "email": 1, "name": 1, "created_at": 1}
+        )
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
+        _JWT_CACHE[token] = (user, payload["exp"])
         return user
     except jwt.ExpiredSignatureError:
+        _JWT_CACHE.pop(token, None)
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
@@ -196,6 +372,18 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
 
 # ==================== PROMPT ENGINEER AGENT ====================
 
+# Strips the markdown code fence the LLM sometimes wraps around its JSON
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+_genai_client: Optional[genai.Client] = None
+
+def get_genai_client() -> genai.Client:
+    """Return the shared Google Genai client, creating it on first use"""
+    global _genai_client
+    if _genai_client is None:
+        _genai_client = genai.Client(api_key=GEMINI_API_KEY)
+    return _genai_client
+
 PROMPT_SYSTEM_MESSAGE = """You are an expert AI Video Prompt Engineer specialized in creating highly optimized, cinematic video prompts for short-form content platforms like Instagram Reels, YouTube Shorts, and TikTok.
 
 Your task is to generate detailed, scene-by-scene video prompts that maximize viewer retention and engagement. Every prompt you create must follow this structure:
@@ -247,10 +435,89 @@ Always respond in valid JSON format with this exact structure:
     }
 }"""
 
-async def generate_video_prompt(request: PromptGenerateRequest) -> dict:
-    """Use Gemini 2.5 Flash to generate optimized video prompt"""
-    
-    user_prompt = f"""Create a highly engaging short-form video prompt with these specifications:
+# Generation config built once - the system instruction never changes per request
+_PROMPT_CONFIG = genai_types.GenerateContentConfig(
+    system_instruction=PROMPT_SYSTEM_MESSAGE,
+    temperature=0.7
+)
+
+# Structure of the prompt JSON described above, compiled once at import
+PROMPT_SCHEMA = {
+    "type": "object",
+    "required": ["hook", "scenes", "visual_style", "audio", "metadata"],
+    "properties": {
+        "hook": {
+            "type": "object",
+            "required": ["description"],
+            "properties": {
+                "description": {"type": "string"},
+                "text_overlay": {"type": "string"},
+                "emotion": {"type": "string"}
+            }
+        },
+        "scenes": {
+            "type": "array",
+            "minItems": 1,
+            "items": {
+                "type": "object",
+                "required": ["visual_description"],
+                "properties": {
+                    "scene_number": {"type": "integer"},
+                    "duration_seconds": {"type": "number"},
+                    "visual_description": {"type": "string"},
+                    "camera_movement": {"type": "string"},
+                    "text_overlay": {"type": "string"},
+                    "transition_to_next": {"type": "string"}
+                }
+            }
+        },
+        "visual_style": {"type": "object"},
+        "audio": {"type": "object"},
+        "metadata": {"type": "object"}
+    }
+}
+_validate_prompt = fastjsonschema.compile(PROMPT_SCHEMA)
+
+@functools.lru_cache(maxsize=1024)
+def _default_prompt(niche: str, platform: str, video_length: int, tone: str) -> dict:
+    """Fallback prompt template, cached per input - shared, so treat as read-only"""
+    return {
+        "hook": {
+            "description": f"Captivating {niche} opening shot",
+            "text_overlay": f"You won't believe this {niche} secret...",
+            "emotion": "curiosity"
+        },
+        "scenes": [
+            {
+                "scene_number": 1,
+                "duration_seconds": video_length // 3,
+                "visual_description": f"Dynamic {niche} content establishing shot",
+                "camera_movement": "slow zoom",
+                "text_overlay": "",
+                "transition_to_next": "smooth fade"
+            }
+        ],
+        "visual_style": {
+            "cinematography": tone,
+            "lighting": "professional studio",
+            "color_grade": "modern cinematic",
+            "mood": tone
+        },
+        "audio": {
+            "music_style": f"{tone} background track",
+            "sound_effects": [],
+            "voiceover": "optional narration"
+        },
+        "metadata": {
+            "aspect_ratio": "9:16",
+            "total_duration": video_length,
+            "platform_optimization": platform,
+            "retention_hooks": ["opening hook", "mid-video reveal"]
+        }
+    }
+
+def build_prompt_message(request: PromptGenerateRequest) -> str:
+    return f"""Create a highly engaging short-form video prompt with these specifications:
 
 NICHE/TOPIC: {request.niche}
 TARGET PLATFORM: {request.platform}
@@ -261,81 +528,75 @@ GOAL: {request.goal}
 
 Generate a complete video prompt following the exact JSON structure specified. Make it highly specific, visually compelling, and optimized for maximum engagement and retention on {request.platform}."""
 
+def parse_prompt_response(response_text: str) -> dict:
+    """Parse and validate the LLM's JSON prompt, raising if it is malformed"""
+    # Sometimes LLM adds markdown
+    prompt_data = orjson.loads(_FENCE.sub("", response_text.strip()))
+    _validate_prompt(prompt_data)
+    return {
+        "success": True,
+        "prompt": prompt_data,
+        "raw_text": response_text
+    }
+
+def fallback_prompt_result(request: PromptGenerateRequest, error: Exception) -> dict:
+    """Default template result used when generation fails"""
+    logger.error(f"Prompt generation error: {error}")
+    return {
+        "success": False,
+        "error": str(error),
+        "prompt": _default_prompt(request.niche, request.platform, request.video_length, request.tone),
+        "raw_text": f"Generated default template for {request.niche}"
+    }
+
+async def generate_video_prompt(request: PromptGenerateRequest) -> dict:
+    """Use Gemini 2.5 Flash to generate optimized video prompt"""
+    # Drain the async stream rather than making a blocking call on the event loop
+    async for result in stream_video_prompt(request):
+        pass
+    return result
+
+def prompt_cache_key(request: PromptGenerateRequest) -> str:
+    """SHA-256 of the canonical request, so identical requests share a cache entry"""
+    return hashlib.sha256(orjson.dumps(request.model_dump(), option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+async def stream_video_prompt(request: PromptGenerateRequest):
+    """Stream Gemini output as it is generated.
+    
+    Yields each text chunk as a str, then the final result dict (same shape as
+    generate_video_prompt) once the full response has been parsed. Requests
+    already answered within PROMPT_CACHE_TTL_SECONDS are served from prompt_cache.
+    """
+    key = prompt_cache_key(request)
+    cached = await db.prompt_cache.find_one({"_id": key}, {"_id": 0, "prompt": 1, "raw_text": 1})
+    if cached:
+        yield cached["raw_text"]
+        yield {"success": True, **cached}
+        return
+    
+    chunks = []
     try:
-        # Create client for Google Genai
-        client = genai.Client(api_key=GEMINI_API_KEY)
-        
-        # Generate content with system instruction
-        response = client.models.generate_content(
-            model='gemini-2.0-flash-exp',
-            contents=user_prompt,
-            config={
-                'system_instruction': PROMPT_SYSTEM_MESSAGE,
-                'temperature': 0.7
-            }
+        stream = await get_genai_client().aio.models.generate_content_stream(
+            model=GEMINI_MODEL,
+            contents=build_prompt_message(request),
+            config=_PROMPT_CONFIG
         )
-        
-        response_text = response.text
-        
-        # Parse the JSON response
-        import json
-        # Clean up response - sometimes LLM adds markdown
-        response_text = response_text.strip()
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        
-        prompt_data = json.loads(response_text.strip())
-        return {
-            "success": True,
-            "prompt": prompt_data,
-            "raw_text": response.text
-        }
+        async for chunk in stream:
+            if chunk.text:
+                chunks.append(chunk.text)
+                yield chunk.text
+        result = parse_prompt_response("".join(chunks))
     except Exception as e:
-        logger.error(f"Prompt generation error: {e}")
-        # Return a default template if generation fails
-        return {
-            "success": False,
-            "error": str(e),
-            "prompt": {
-                "hook": {
-                    "description": f"Captivating {request.niche} opening shot",
-                    "text_overlay": f"You won't believe this {request.niche} secret...",
-                    "emotion": "curiosity"
-                },
-                "scenes": [
-                    {
-                        "scene_number": 1,
-                        "duration_seconds": request.video_length // 3,
-                        "visual_description": f"Dynamic {request.niche} content establishing shot",
-                        "camera_movement": "slow zoom",
-                        "text_overlay": "",
-                        "transition_to_next": "smooth fade"
-                    }
-                ],
-                "visual_style": {
-                    "cinematography": request.tone,
-                    "lighting": "professional studio",
-                    "color_grade": "modern cinematic",
-                    "mood": request.tone
-                },
-                "audio": {
-                    "music_style": f"{request.tone} background track",
-                    "sound_effects": [],
-                    "voiceover": "optional narration"
-                },
-                "metadata": {
-                    "aspect_ratio": "9:16",
-                    "total_duration": request.video_length,
-                    "platform_optimization": request.platform,
-                    "retention_hooks": ["opening hook", "mid-video reveal"]
-                }
-            },
-            "raw_text": f"Generated default template for {request.niche}"
-        }
+        result = fallback_prompt_result(request, e)
+    
+    # Only real generations are cached; fallbacks should be retried next time
+    if result["success"]:
+        await db.prompt_cache.update_one(
+            {"_id": key},
+            {"$set": {"prompt": result["prompt"], "raw_text": result["raw_text"], "ts": _utcnow()}},
+            upsert=True
+        )
+    yield result
 
 
 
@@ -374,6 +635,11 @@ Always respond in valid JSON format with this EXACT structure:
 
 IMPORTANT: Return ONLY the JSON, no additional text or markdown."""
 
+_CAPTION_CONFIG = genai_types.GenerateContentConfig(
+    system_instruction=CAPTION_SYSTEM_MESSAGE,
+    temperature=0.7
+)
+
 async def generate_caption_and_hashtags(niche: str, tone: str, platform: str, 
                                        video_length: int, goal: str, 
                                        video_topic: str = "") -> dict:
@@ -393,33 +659,16 @@ Create a caption and hashtags that will maximize {goal} on {platform}. The capti
 Return ONLY valid JSON with "caption" and "hashtags" fields."""
 
     try:
-        # Create client for Google Genai
-        client = genai.Client(api_key=GEMINI_API_KEY)
-        
-        # Generate content with system instruction
-        response = client.models.generate_content(
-            model='gemini-2.0-flash-exp',
+        # Stream content with system instruction so the event loop is never blocked on Gemini
+        stream = await get_genai_client().aio.models.generate_content_stream(
+            model=GEMINI_MODEL,
             contents=user_prompt,
-            config={
-                'system_instruction': CAPTION_SYSTEM_MESSAGE,
-                'temperature': 0.7
-            }
+            config=_CAPTION_CONFIG
         )
+        response_text = "".join([chunk.text async for chunk in stream if chunk.text])
         
-        response_text = response.text
-        
-        # Parse the JSON response
-        import json
-        # Clean up response - sometimes LLM adds markdown
-        response_text = response_text.strip()
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        
-        caption_data = json.loads(response_text.strip())
+        # Parse the JSON response - sometimes LLM adds markdown
+        caption_data = orjson.loads(_FENCE.sub("", response_text.strip()))
         
         # Validate structure
         if "caption" not in caption_data or "hashtags" not in caption_data:
@@ -459,9 +708,22 @@ Return ONLY valid JSON with "caption" and "hashtags" fields."""
             ]
         }
 
+def format_caption(caption: str, hashtags: List[str]) -> str:
+    """Instagram caption text; hashtags from generate_caption_and_hashtags already carry '#'"""
+    return f"{caption}\n\n{' '.join(hashtags)}" if hashtags else caption
+
 
 # ==================== INSTAGRAM API SERVICE (REAL) ====================
 
+# Business Account ID shared between workers through the app_config collection.
+# The ID is fixed for a given account, so the stored copy never expires.
+IG_ACCOUNT_ID_KEY = "instagram_business_account_id"
+
+# The account-ID refresh makes two sequential Graph calls under a lease; keep their
+# combined worst case inside the lease so it can't expire mid-refresh
+IG_FETCH_LEASE_SECONDS = 30
+IG_ACCOUNT_FETCH_TIMEOUT = aiohttp.ClientTimeout(total=10)
+
 class InstagramService:
     """Real Instagram Graph API service for posting Reels"""
     
@@ -471,117 +733,150 @@ class InstagramService:
         self.base_url = "https://graph.instagram.com"
         self.api_version = "v21.0"
         self.mock_mode = False  # Set to True for testing without real API
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._business_account_lock = asyncio.Lock()
         
         # If credentials are missing, enable mock mode
         if not self.access_token or not self.business_account_id:
             logger.warning("Instagram credentials not configured. Running in MOCK mode.")
             self.mock_mode = True
     
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Shared HTTP session so Graph API calls reuse pooled keep-alive connections"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=50, ttl_dns_cache=300, keepalive_timeout=60)
+            )
+        return self._session
+    
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+    
+    async def _resolve_business_account_id(self) -> Optional[str]:
+        """Look up the Business Account ID once; concurrent callers share the same lookup"""
+        async with self._business_account_lock:
+            if not self.business_account_id:
+                self.business_account_id = (
+                    await self.load_shared_business_account_id()
+                    or await self._fetch_business_account_id()
+                )
+        return self.business_account_id
+    
+    async def load_shared_business_account_id(self) -> Optional[str]:
+        """Business Account ID previously stored by any worker"""
+        doc = await db.app_config.find_one({"_id": IG_ACCOUNT_ID_KEY}, {"value": 1})
+        return doc["value"] if doc else None
+    
+    async def adopt_shared_business_account_id(self) -> bool:
+        """Leave no-ID mock mode once any worker has stored the Business Account ID"""
+        if self.mock_mode and self.access_token and not self.business_account_id:
+            account_id = await self.load_shared_business_account_id()
+            if account_id:
+                self.business_account_id = account_id
+                self.mock_mode = False
+        return not self.mock_mode
+    
+    async def _store_shared_business_account_id(self, account_id: str):
+        await db.app_config.update_one(
+            {"_id": IG_ACCOUNT_ID_KEY},
+            {"$set": {"value": account_id, "updated_at": _utcnow()}},
+            upsert=True
+        )
+    
     async def _fetch_business_account_id(self) -> Optional[str]:
         """Fetch Instagram Business Account ID from Facebook Pages"""
-        import aiohttp
-        
         try:
-            async with aiohttp.ClientSession() as session:
-                # First, get Facebook pages
-                url = f"{self.base_url}/{self.api_version}/me/accounts"
-                params = {"access_token": self.access_token}
+            session = await self._get_session()
+            # First, get Facebook pages
+            url = f"{self.base_url}/{self.api_version}/me/accounts"
+            params = {"access_token": self.access_token}
+            
+            async with session.get(url, params=params, timeout=IG_ACCOUNT_FETCH_TIMEOUT) as response:
+                if response.status != 200:
+                    logger.error(f"Failed to fetch Facebook pages: {response.status}")
+                    return None
                 
-                async with session.get(url, params=params) as response:
-                    if response.status != 200:
-                        logger.error(f"Failed to fetch Facebook pages: {response.status}")
-                        return None
-                    
-                    data = await response.json()
-                    pages = data.get("data", [])
-                    
-                    if not pages:
-                        logger.error("No Facebook pages found")
+                data = await response.json(loads=orjson.loads)
+                pages = data.get("data", [])
+                
+                if not pages:
+                    logger.error("No Facebook pages found")
+                    return None
+                
+                # Get Instagram account from first page
+                page_id = pages[0]["id"]
+                page_access_token = pages[0]["access_token"]
+                
+                url = f"{self.base_url}/{self.api_version}/{page_id}"
+                params = {
+                    "fields": "instagram_business_account",
+                    "access_token": page_access_token
+                }
+                
+                async with session.get(url, params=params, timeout=IG_ACCOUNT_FETCH_TIMEOUT) as ig_response:
+                    if ig_response.status != 200:
+                        logger.error(f"Failed to fetch Instagram account: {ig_response.status}")
                         return None
                     
-                    # Get Instagram account from first page
-                    page_id = pages[0]["id"]
-                    page_access_token = pages[0]["access_token"]
+                    ig_data = await ig_response.json(loads=orjson.loads)
+                    ig_account = ig_data.get("instagram_business_account", {})
+                    ig_account_id = ig_account.get("id")
                     
-                    url = f"{self.base_url}/{self.api_version}/{page_id}"
-                    params = {
-                        "fields": "instagram_business_account",
-                        "access_token": page_access_token
-                    }
+                    if ig_account_id:
+                        logger.info(f"Found Instagram Business Account ID: {ig_account_id}")
+                        await self._store_shared_business_account_id(ig_account_id)
+                        return ig_account_id
                     
-                    async with session.get(url, params=params) as ig_response:
-                        if ig_response.status != 200:
-                            logger.error(f"Failed to fetch Instagram account: {ig_response.status}")
-                            return None
-                        
-                        ig_data = await ig_response.json()
-                        ig_account = ig_data.get("instagram_business_account", {})
-                        ig_account_id = ig_account.get("id")
-                        
-                        if ig_account_id:
-                            logger.info(f"Found Instagram Business Account ID: {ig_account_id}")
-                            return ig_account_id
-                        
-                        return None
+                    return None
         except Exception as e:
             logger.error(f"Error fetching business account ID: {e}")
             return None
     
-    async def create_media_container(self, video_url: str, caption: str, 
-                                    hashtags: List[str]) -> Optional[str]:
-        """Create media container for Instagram Reel"""
+    async def create_media_container(self, video_url: str, caption: str) -> Optional[str]:
+        """Create media container for Instagram Reel (caption already includes hashtags)"""
         
         if self.mock_mode:
             # Return mock media ID
-            mock_media_id = f"mock_ig_{uuid.uuid4().hex[:12]}"
+            mock_media_id = f"mock_ig_{secrets.token_hex(6)}"
             logger.info(f"[MOCK] Created media container: {mock_media_id}")
             logger.info(f"[MOCK] Video URL: {video_url}")
             logger.info(f"[MOCK] Caption: {caption[:50]}...")
-            logger.info(f"[MOCK] Hashtags: {', '.join(hashtags[:3])}...")
             return mock_media_id
         
         # Fetch business account ID if not set
-        if not self.business_account_id:
-            self.business_account_id = await self._fetch_business_account_id()
-            if not self.business_account_id:
-                logger.error("Cannot create media container without Business Account ID")
-                # Fallback to mock mode
-                self.mock_mode = True
-                return await self.create_media_container(video_url, caption, hashtags)
-        
-        import aiohttp
-        
-        # Format caption with hashtags
-        formatted_caption = caption
-        if hashtags:
-            formatted_caption += "\n\n" + " ".join([f"#{tag}" if not tag.startswith("#") else tag for tag in hashtags])
+        if not self.business_account_id and not await self._resolve_business_account_id():
+            logger.error("Cannot create media container without Business Account ID")
+            # Fallback to mock mode
+            self.mock_mode = True
+            return await self.create_media_container(video_url, caption)
         
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.base_url}/{self.api_version}/{self.business_account_id}/media"
+            session = await self._get_session()
+            url = f"{self.base_url}/{self.api_version}/{self.business_account_id}/media"
+            
+            payload = {
+                "media_type": "REELS",
+                "video_url": video_url,
+                "caption": caption,
+                "share_to_feed": True,
+                "access_token": self.access_token
+            }
+            
+            logger.info(f"Creating Instagram media container for video: {video_url}")
+            
+            async with session.post(url, data=payload) as response:
+                response_text = await response.text()
                 
-                payload = {
-                    "media_type": "REELS",
-                    "video_url": video_url,
-                    "caption": formatted_caption,
-                    "share_to_feed": True,
-                    "access_token": self.access_token
-                }
+                if response.status != 200:
+                    logger.error(f"Instagram API Error [{response.status}]: {response_text}")
+                    return None
                 
-                logger.info(f"Creating Instagram media container for video: {video_url}")
+                data = orjson.loads(response_text)
+                container_id = data.get("id")
                 
-                async with session.post(url, data=payload) as response:
-                    response_text = await response.text()
-                    
-                    if response.status != 200:
-                        logger.error(f"Instagram API Error [{response.status}]: {response_text}")
-                        return None
-                    
-                    data = await response.json()
-                    container_id = data.get("id")
-                    
-                    logger.info(f"Successfully created media container: {container_id}")
-                    return container_id
+                logger.info(f"Successfully created media container: {container_id}")
+                return container_id
         except Exception as e:
             logger.error(f"Error creating media container: {e}")
             return None
@@ -592,23 +887,21 @@ class InstagramService:
         if self.mock_mode:
             return {"status": "FINISHED", "status_code": "FINISHED"}
         
-        import aiohttp
-        
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.base_url}/{self.api_version}/{container_id}"
-                params = {
-                    "fields": "status_code",
-                    "access_token": self.access_token
-                }
+            session = await self._get_session()
+            url = f"{self.base_url}/{self.api_version}/{container_id}"
+            params = {
+                "fields": "status_code,status",
+                "access_token": self.access_token
+            }
+            
+            async with session.get(url, params=params) as response:
+                if response.status != 200:
+                    logger.error(f"Failed to get container status: {response.status}")
+                    return None
                 
-                async with session.get(url, params=params) as response:
-                    if response.status != 200:
-                        logger.error(f"Failed to get container status: {response.status}")
-                        return None
-                    
-                    data = await response.json()
-                    return data
+                data = await response.json(loads=orjson.loads)
+                return data
         except Exception as e:
             logger.error(f"Error checking container status: {e}")
             return None
@@ -618,54 +911,50 @@ class InstagramService:
         """Publish the reel to Instagram"""
         
         if self.mock_mode:
-            # Simulate Instagram publishing
-            import asyncio
-            await asyncio.sleep(2)  # Simulate processing time
-            
-            mock_post_id = f"mock_post_{uuid.uuid4().hex[:12]}"
+            # Simulate Instagram publishing; completes immediately so the
+            # background task doesn't hold the job open on a timer
+            mock_post_id = f"mock_post_{secrets.token_hex(6)}"
             logger.info(f"[MOCK] Published reel: {mock_post_id}")
             
             return {
                 "success": True,
                 "instagram_post_id": mock_post_id,
                 "instagram_url": f"https://instagram.com/p/{mock_post_id}",
-                "posted_at": datetime.now(timezone.utc).isoformat()
+                "posted_at": _iso_utcnow()
             }
         
-        import aiohttp
-        
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.base_url}/{self.api_version}/{self.business_account_id}/media_publish"
-                
-                payload = {
-                    "creation_id": container_id,
-                    "access_token": self.access_token
-                }
-                
-                logger.info(f"Publishing reel with container ID: {container_id}")
+            session = await self._get_session()
+            url = f"{self.base_url}/{self.api_version}/{self.business_account_id}/media_publish"
+            
+            payload = {
+                "creation_id": container_id,
+                "access_token": self.access_token
+            }
+            
+            logger.info(f"Publishing reel with container ID: {container_id}")
+            
+            async with session.post(url, data=payload) as response:
+                response_text = await response.text()
                 
-                async with session.post(url, data=payload) as response:
-                    response_text = await response.text()
-                    
-                    if response.status != 200:
-                        logger.error(f"Instagram Publish Error [{response.status}]: {response_text}")
-                        return {
-                            "success": False,
-                            "error": response_text
-                        }
-                    
-                    data = await response.json()
-                    media_id = data.get("id")
-                    
-                    logger.info(f"Successfully published reel: {media_id}")
-                    
+                if response.status != 200:
+                    logger.error(f"Instagram Publish Error [{response.status}]: {response_text}")
                     return {
-                        "success": True,
-                        "instagram_post_id": media_id,
-                        "instagram_url": f"https://www.instagram.com/reel/{media_id}",
-                        "posted_at": datetime.now(timezone.utc).isoformat()
+                        "success": False,
+                        "error": response_text
                     }
+                
+                data = orjson.loads(response_text)
+                media_id = data.get("id")
+                
+                logger.info(f"Successfully published reel: {media_id}")
+                
+                return {
+                    "success": True,
+                    "instagram_post_id": media_id,
+                    "instagram_url": f"https://www.instagram.com/reel/{media_id}",
+                    "posted_at": _iso_utcnow()
+                }
         except Exception as e:
             logger.error(f"Error publishing reel: {e}")
             return {
@@ -678,7 +967,6 @@ class InstagramService:
         
         if self.mock_mode:
             # Return mock analytics
-            import random
             return {
                 "views": random.randint(100, 10000),
                 "likes": random.randint(10, 1000),
@@ -688,33 +976,31 @@ class InstagramService:
                 "reach": random.randint(150, 15000)
             }
         
-        import aiohttp
-        
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.base_url}/{self.api_version}/{media_id}/insights"
-                params = {
-                    "metric": "impressions,reach,likes,comments,shares,saved",
-                    "access_token": self.access_token
-                }
+            session = await self._get_session()
+            url = f"{self.base_url}/{self.api_version}/{media_id}/insights"
+            params = {
+                "metric": "impressions,reach,likes,comments,shares,saved",
+                "access_token": self.access_token
+            }
+            
+            async with session.get(url, params=params) as response:
+                if response.status != 200:
+                    logger.warning(f"Failed to fetch insights: {response.status}")
+                    return None
                 
-                async with session.get(url, params=params) as response:
-                    if response.status != 200:
-                        logger.warning(f"Failed to fetch insights: {response.status}")
-                        return None
-                    
-                    data = await response.json()
-                    insights_data = data.get("data", [])
-                    
-                    # Parse insights into a simple dict
-                    insights = {}
-                    for item in insights_data:
-                        metric_name = item.get("name")
-                        metric_values = item.get("values", [])
-                        if metric_values:
-                            insights[metric_name] = metric_values[0].get("value", 0)
-                    
-                    return insights
+                data = await response.json(loads=orjson.loads)
+                insights_data = data.get("data", [])
+                
+                # Parse insights into a simple dict
+                insights = {}
+                for item in insights_data:
+                    metric_name = item.get("name")
+                    metric_values = item.get("values", [])
+                    if metric_values:
+                        insights[metric_name] = metric_values[0].get("value", 0)
+                
+                return insights
         except Exception as e:
             logger.error(f"Error fetching insights: {e}")
             return None
@@ -731,21 +1017,28 @@ async def register(user_data: UserCreate):
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    user_id = str(uuid.uuid4())
+    user_id = _new_id()
     user_doc = {
         "id": user_id,
         "email": user_data.email,
-        "password": hash_password(user_data.password),
+        "password": await ahash_password(user_data.password),
         "name": user_data.name,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": _iso_utcnow(),
+        # Running performance totals, kept in step by the performance routes
+        "total_views": 0,
+        "total_likes": 0
     }
     
-    await db.users.insert_one(user_doc)
+    try:
+        await db.users.insert_one(user_doc)
+    except DuplicateKeyError:
+        # A concurrent sign-up with the same email won the unique index
+        raise HTTPException(status_code=400, detail="Email already registered")
     
     token = create_token(user_id)
-    return TokenResponse(
+    return TokenResponse.model_construct(
         access_token=token,
-        user=UserResponse(
+        user=UserResponse.model_construct(
             id=user_id,
             email=user_data.email,
             name=user_data.name,
@@ -756,13 +1049,22 @@ async def register(user_data: UserCreate):
 @api_router.post("/auth/login", response_model=TokenResponse)
 async def login(credentials: UserLogin):
     user = await db.users.find_one({"email": credentials.email})
-    if not user or not verify_password(credentials.password, user["password"]):
+    hashed = user["password"] if user else _DUMMY_PASSWORD_HASH
+    if not await averify_password(credentials.password, hashed) or not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
+    # Bring hashes from an older cost up to BCRYPT_ROUNDS so every account verifies
+    # in the same time as _DUMMY_PASSWORD_HASH
+    if hash_rounds(hashed) != BCRYPT_ROUNDS:
+        await db.users.update_one(
+            {"id": user["id"], "password": hashed},
+            {"$set": {"password": await ahash_password(credentials.password)}}
+        )
+    
     token = create_token(user["id"])
-    return TokenResponse(
+    return TokenResponse.model_construct(
         access_token=token,
-        user=UserResponse(
+        user=UserResponse.model_construct(
             id=user["id"],
             email=user["email"],
             name=user["name"],
@@ -772,41 +1074,58 @@ async def login(credentials: UserLogin):
 
 @api_router.get("/auth/me", response_model=UserResponse)
 async def get_me(current_user: dict = Depends(get_current_user)):
-    return UserResponse(**current_user)
+    return UserResponse.model_construct(**current_user)
 
 
 # ==================== PROJECT ROUTES ====================
 
 @api_router.post("/projects", response_model=ProjectResponse)
 async def create_project(project: ProjectCreate, current_user: dict = Depends(get_current_user)):
-    project_id = str(uuid.uuid4())
+    project_id = _new_id()
     project_doc = {
         "id": project_id,
         "user_id": current_user["id"],
         "name": project.name,
         "description": project.description or "",
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": _iso_utcnow()
     }
     await db.projects.insert_one(project_doc)
-    return ProjectResponse(**project_doc)
+    return ProjectResponse.model_construct(**project_doc)
 
 @api_router.get("/projects", response_model=List[ProjectResponse])
 async def get_projects(current_user: dict = Depends(get_current_user)):
-    projects = await db.projects.find({"user_id": current_user["id"]}, {"_id": 0}).to_list(100)
-    return [ProjectResponse(**p) for p in projects]
+    projects = await db.projects.find({"user_id": current_user["id"]}, {"_id": 0}).limit(100).to_list(100)
+    return [ProjectResponse.model_construct(**p) for p in projects]
 
 
 # ==================== PROMPT ROUTES ====================
 
-@api_router.post("/prompts/generate", response_model=PromptResponse)
-async def generate_prompt(request: PromptGenerateRequest, current_user: dict = Depends(get_current_user)):
-    # Generate the prompt using AI
-    result = await generate_video_prompt(request)
+def build_fal_prompt(generated_prompt: dict) -> str:
+    """Flatten a structured prompt into the text sent to FAL.ai"""
+    hook = generated_prompt.get("hook", {})
+    visual_style = generated_prompt.get("visual_style", {})
+    parts = []
+    
+    if hook.get("description"):
+        parts.append(f"Opening: {hook['description']}")
+    
+    # First 3 scenes keep the text prompt brief
+    for scene in generated_prompt.get("scenes", [])[:3]:
+        if scene.get("visual_description"):
+            parts.append(scene["visual_description"])
+    
+    if visual_style.get("cinematography"):
+        parts.append(f"Style: {visual_style['cinematography']}")
+    if visual_style.get("mood"):
+        parts.append(f"Mood: {visual_style['mood']}")
     
-    prompt_id = str(uuid.uuid4())
+    return ". ".join(parts)
+
+async def save_prompt(request: PromptGenerateRequest, result: dict, user_id: str) -> dict:
+    """Persist a generated prompt and return the stored document"""
     prompt_doc = {
-        "id": prompt_id,
-        "user_id": current_user["id"],
+        "id": _new_id(),
+        "user_id": user_id,
         "project_id": None,
         "niche": request.niche,
         "platform": request.platform,
@@ -816,30 +1135,60 @@ async def generate_prompt(request: PromptGenerateRequest, current_user: dict = D
         "custom_idea": request.custom_idea or "",
         "generated_prompt": result["prompt"],
         "raw_prompt_text": result.get("raw_text", ""),
-        "created_at": datetime.now(timezone.utc).isoformat(),
+        "fal_prompt_text": build_fal_prompt(result["prompt"]),
+        "created_at": _iso_utcnow(),
         "status": "draft"
     }
     
     await db.prompts.insert_one(prompt_doc)
-    return PromptResponse(**prompt_doc)
+    forget_dashboard(user_id)
+    return prompt_doc
 
-@api_router.get("/prompts", response_model=List[PromptResponse])
+@api_router.post("/prompts/generate", response_model=PromptResponse)
+async def generate_prompt(request: PromptGenerateRequest, current_user: dict = Depends(get_current_user)):
+    # Generate the prompt using AI
+    result = await generate_video_prompt(request)
+    prompt_doc = await save_prompt(request, result, current_user["id"])
+    return PromptResponse.model_construct(**prompt_doc)
+
+@api_router.post("/prompts/generate/stream", response_class=StreamingResponse)
+async def generate_prompt_stream(request: PromptGenerateRequest, current_user: dict = Depends(get_current_user)):
+    """Generate a prompt as server-sent events: 'delta' events carry raw LLM text
+    as it arrives, and a final 'prompt' event carries the saved prompt"""
+    async def events():
+        async for item in stream_video_prompt(request):
+            if isinstance(item, str):
+                yield sse_event("delta", {"text": item})
+            else:
+                prompt_doc = await save_prompt(request, item, current_user["id"])
+                yield sse_event("prompt", PromptResponse.model_construct(**prompt_doc).model_dump())
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@api_router.get("/prompts", response_model=List[PromptSummary])
 async def get_prompts(current_user: dict = Depends(get_current_user), limit: int = 50):
-    prompts = await db.prompts.find(
+    # Streamed straight from the cursor; response_model only documents the shape
+    cursor = db.prompts.find(
         {"user_id": current_user["id"]}, 
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(limit)
-    return [PromptResponse(**p) for p in prompts]
+        PROMPT_LIST_PROJECTION
+    ).sort("created_at", -1).limit(limit).batch_size(limit)
+    return StreamingResponse(json_array(cursor), media_type="application/json")
+
+@api_router.get("/prompts.ndjson", response_class=StreamingResponse)
+async def stream_prompts(current_user: dict = Depends(get_current_user), limit: int = 50):
+    """Stream prompts as newline-delimited JSON without buffering the whole list"""
+    cursor = db.prompts.find(
+        {"user_id": current_user["id"]},
+        PROMPT_LIST_PROJECTION
+    ).sort("created_at", -1).limit(limit).batch_size(limit)
+    return StreamingResponse(ndjson_lines(cursor), media_type="application/x-ndjson")
 
 @api_router.get("/prompts/{prompt_id}", response_model=PromptResponse)
 async def get_prompt(prompt_id: str, current_user: dict = Depends(get_current_user)):
-    prompt = await db.prompts.find_one(
-        {"id": prompt_id, "user_id": current_user["id"]},
-        {"_id": 0}
-    )
+    prompt = await find_owned_doc("prompts", prompt_id, current_user["id"])
     if not prompt:
         raise HTTPException(status_code=404, detail="Prompt not found")
-    return PromptResponse(**prompt)
+    return PromptResponse.model_construct(**prompt)
 
 @api_router.patch("/prompts/{prompt_id}/approve")
 async def approve_prompt(prompt_id: str, current_user: dict = Depends(get_current_user)):
@@ -847,6 +1196,7 @@ async def approve_prompt(prompt_id: str, current_user: dict = Depends(get_curren
         {"id": prompt_id, "user_id": current_user["id"]},
         {"$set": {"status": "approved"}}
     )
+    forget_doc("prompts", prompt_id)
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Prompt not found")
     return {"message": "Prompt approved"}
@@ -855,7 +1205,7 @@ async def approve_prompt(prompt_id: str, current_user: dict = Depends(get_curren
 # ==================== VIDEO ROUTES ====================
 
 @api_router.post("/videos/generate", response_model=VideoResponse)
-async def generate_video(request: VideoGenerateRequest, background_tasks: BackgroundTasks, current_user: dict = Depends(get_current_user)):
+async def generate_video(request: VideoGenerateRequest, current_user: dict = Depends(get_current_user)):
     # Verify prompt exists and belongs to user
     prompt = await db.prompts.find_one(
         {"id": request.prompt_id, "user_id": current_user["id"]},
@@ -864,7 +1214,7 @@ async def generate_video(request: VideoGenerateRequest, background_tasks: Backgr
     if not prompt:
         raise HTTPException(status_code=404, detail="Prompt not found")
     
-    video_id = str(uuid.uuid4())
+    video_id = _new_id()
     video_doc = {
         "id": video_id,
         "user_id": current_user["id"],
@@ -873,27 +1223,29 @@ async def generate_video(request: VideoGenerateRequest, background_tasks: Backgr
         "video_url": None,
         "duration": prompt.get("video_length", 30),
         "resolution": "1080x1920",
-        "created_at": datetime.now(timezone.utc).isoformat(),
+        "created_at": _iso_utcnow(),
         "completed_at": None
     }
     
-    await db.videos.insert_one(video_doc)
-    
-    # Update prompt status
-    await db.prompts.update_one(
-        {"id": request.prompt_id},
-        {"$set": {"status": "generating"}}
+    # Insert video and update prompt status concurrently
+    await asyncio.gather(
+        db.videos.insert_one(video_doc),
+        db.prompts.update_one(
+            {"id": request.prompt_id},
+            {"$set": {"status": "generating"}}
+        )
     )
+    forget_doc("prompts", request.prompt_id)
+    forget_dashboard(current_user["id"])
+    _VIDEO_OWNER[video_id] = current_user["id"]
     
-    # Queue video generation (mock for MVP - Veo API not publicly available)
-    background_tasks.add_task(process_video_generation, video_id, prompt)
+    # Queue video generation; the "queued" document is the durable record of the job
+    video_queue.put_nowait(video_id)
     
-    return VideoResponse(**video_doc)
+    return VideoResponse.model_construct(**video_doc)
 
 async def generate_video_with_fal(prompt_text: str, video_length: int) -> dict:
     """Generate video using FAL.ai text-to-video API"""
-    import fal_client
-    
     if not FAL_KEY:
         logger.error("FAL_KEY not configured")
         raise ValueError("FAL_KEY not configured")
@@ -918,9 +1270,9 @@ async def generate_video_with_fal(prompt_text: str, video_length: int) -> dict:
         )
         logger.info(f"FAL.ai job submitted: {handler.request_id}")
         
-        # Wait for result with timeout
+        # Wait for result, giving up well before the video's claim could be taken over
         logger.info("Waiting for FAL.ai result...")
-        result = await handler.get()
+        result = await asyncio.wait_for(handler.get(), timeout=FAL_RESULT_TIMEOUT.total_seconds())
         logger.info(f"FAL.ai result received: {result.keys() if result else 'None'}")
         
         return {
@@ -931,52 +1283,21 @@ async def generate_video_with_fal(prompt_text: str, video_length: int) -> dict:
         }
     except Exception as e:
         logger.error(f"FAL.ai video generation error: {e}")
-        import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
         return {
             "success": False,
             "error": str(e)
         }
 
-async def process_video_generation(video_id: str, prompt: dict):
+async def process_video_generation(video_id: str, prompt: dict, claim: str):
     """Background task to process video generation using FAL.ai"""
-    import asyncio
-    
     try:
         logger.info(f"Starting video generation for {video_id}")
         
-        # Update status to processing
-        await db.videos.update_one(
-            {"id": video_id},
-            {"$set": {"status": "processing"}}
-        )
-        logger.info(f"Video {video_id} status updated to processing")
-        
-        # Build prompt text from structured prompt
+        # Text-to-video prompt is built when the prompt is saved; older prompts build it here
         prompt_data = prompt.get("generated_prompt", {})
         hook = prompt_data.get("hook", {})
-        scenes = prompt_data.get("scenes", [])
-        visual_style = prompt_data.get("visual_style", {})
-        
-        # Create comprehensive prompt for video generation
-        prompt_text_parts = []
-        
-        # Add hook description
-        if hook.get("description"):
-            prompt_text_parts.append(f"Opening: {hook['description']}")
-        
-        # Add scene descriptions
-        for scene in scenes[:3]:  # Limit to first 3 scenes for brevity
-            if scene.get("visual_description"):
-                prompt_text_parts.append(scene["visual_description"])
-        
-        # Add visual style
-        if visual_style.get("cinematography"):
-            prompt_text_parts.append(f"Style: {visual_style['cinematography']}")
-        if visual_style.get("mood"):
-            prompt_text_parts.append(f"Mood: {visual_style['mood']}")
-        
-        prompt_text = ". ".join(prompt_text_parts)
+        prompt_text = prompt.get("fal_prompt_text") or build_fal_prompt(prompt_data)
         logger.info(f"Video {video_id} - Constructed prompt: {prompt_text[:200]}...")
         
         # Try to generate video with FAL.ai
@@ -987,7 +1308,7 @@ async def process_video_generation(video_id: str, prompt: dict):
         )
         logger.info(f"Video {video_id} - FAL.ai result: {video_result.get('success')}")
         
-        completed_at = datetime.now(timezone.utc).isoformat()
+        completed_at = _iso_utcnow()
         video_url = None
         
         if video_result.get("success"):
@@ -1018,11 +1339,29 @@ async def process_video_generation(video_id: str, prompt: dict):
         
         caption = caption_result.get("caption", "Check out this amazing video! 🔥")
         hashtags = caption_result.get("hashtags", ["#Reels", "#Viral"])
+        formatted_caption = format_caption(caption, hashtags)
         
         logger.info(f"Video {video_id} - Caption generated: {caption[:50]}...")
         logger.info(f"Video {video_id} - Hashtags: {', '.join(hashtags[:3])}...")
         
+        # Every outcome below completes the video; Instagram results are merged in and
+        # written with a single update at the end
+        final_update = {
+            "status": "completed",
+            "video_url": video_url,
+            "duration": video_result.get("duration", prompt.get("video_length", 30)) if video_result.get("success") else prompt.get("video_length", 30),
+            "completed_at": completed_at,
+            "caption_text": caption,
+            "hashtags_used": hashtags,
+            "formatted_caption": formatted_caption,
+            "instagram_post_id": None,
+            "posted_at": None,
+            "platform": "instagram"
+        }
+        
         # ==================== STEP 3: AUTO-POST TO INSTAGRAM (REAL API) ====================
+        # Another worker may have fetched the account ID since this one started
+        await instagram_service.adopt_shared_business_account_id()
         mode = "REAL" if not instagram_service.mock_mode else "MOCK"
         logger.info(f"Video {video_id} - Posting to Instagram ({mode} mode)...")
         
@@ -1030,246 +1369,411 @@ async def process_video_generation(video_id: str, prompt: dict):
             # Create media container
             container_id = await instagram_service.create_media_container(
                 video_url=video_url,
-                caption=caption,
-                hashtags=hashtags
+                caption=formatted_caption
             )
             
             if container_id:
+                # Mock containers are ready at once; real ones only once Graph reports FINISHED
+                ready = instagram_service.mock_mode
+                
                 # Wait for container to be ready (only for real API)
-                if not instagram_service.mock_mode:
+                if not ready:
                     logger.info(f"Video {video_id} - Waiting for container to be ready...")
-                    max_retries = 30
-                    retry_count = 0
+                    # Back off from 1s up to 10s between checks, giving up after 60s total
+                    delay = 1.0
+                    deadline = time.monotonic() + 60
                     
-                    while retry_count < max_retries:
+                    while True:
                         status_result = await instagram_service.get_container_status(container_id)
-                        if status_result and status_result.get("status_code") == "FINISHED":
+                        status_code = status_result.get("status_code") if status_result else None
+                        if status_code == "FINISHED":
                             logger.info(f"Video {video_id} - Container ready for publishing")
+                            ready = True
+                            break
+                        if status_code in ("ERROR", "EXPIRED"):
+                            # Terminal - waiting longer won't make the container publishable
+                            logger.warning(f"Video {video_id} - Container {status_code}: {status_result.get('status')}")
                             break
                         
-                        retry_count += 1
-                        await asyncio.sleep(2)  # Wait 2 seconds between checks
-                    
-                    if retry_count >= max_retries:
-                        logger.warning(f"Video {video_id} - Container processing timeout")
-                
-                # Publish reel
-                publish_result = await instagram_service.publish_reel(
-                    container_id=container_id,
-                    caption=caption,
-                    hashtags=hashtags
-                )
+                        if time.monotonic() + delay > deadline:
+                            logger.warning(f"Video {video_id} - Container processing timeout")
+                            break
+                        await asyncio.sleep(delay)
+                        delay = min(delay * 1.5, 10)
                 
-                if publish_result and publish_result.get("success"):
-                    instagram_post_id = publish_result.get("instagram_post_id")
-                    posted_at = publish_result.get("posted_at")
-                    
-                    logger.info(f"Video {video_id} - Successfully posted to Instagram: {instagram_post_id}")
-                    
-                    # Update video with ALL data including Instagram info
-                    await db.videos.update_one(
-                        {"id": video_id},
-                        {
-                            "$set": {
-                                "status": "completed",
-                                "video_url": video_url,
-                                "duration": video_result.get("duration", prompt.get("video_length", 30)) if video_result.get("success") else prompt.get("video_length", 30),
-                                "completed_at": completed_at,
-                                "caption_text": caption,
-                                "hashtags_used": hashtags,
-                                "instagram_post_id": instagram_post_id,
-                                "posted_at": posted_at,
-                                "platform": "instagram"
-                            }
-                        }
-                    )
+                if not ready:
+                    # Publishing an errored, expired or still-processing container only fails
+                    logger.warning(f"Video {video_id} - Container not ready, skipping Instagram publish")
                 else:
-                    # Instagram posting failed, but video is still complete
-                    logger.warning(f"Video {video_id} - Instagram posting failed")
-                    await db.videos.update_one(
-                        {"id": video_id},
-                        {
-                            "$set": {
-                                "status": "completed",
-                                "video_url": video_url,
-                                "duration": video_result.get("duration", prompt.get("video_length", 30)) if video_result.get("success") else prompt.get("video_length", 30),
-                                "completed_at": completed_at,
-                                "caption_text": caption,
-                                "hashtags_used": hashtags,
-                                "instagram_post_id": None,
-                                "posted_at": None,
-                                "platform": "instagram"
-                            }
-                        }
+                    # Publish reel
+                    publish_result = await instagram_service.publish_reel(
+                        container_id=container_id,
+                        caption=caption,
+                        hashtags=hashtags
                     )
+                    
+                    if publish_result and publish_result.get("success"):
+                        final_update["instagram_post_id"] = publish_result.get("instagram_post_id")
+                        final_update["posted_at"] = publish_result.get("posted_at")
+                        logger.info(f"Video {video_id} - Successfully posted to Instagram: {final_update['instagram_post_id']}")
+                    else:
+                        # Instagram posting failed, but video is still complete
+                        logger.warning(f"Video {video_id} - Instagram posting failed")
             else:
                 # Media container creation failed
                 logger.warning(f"Video {video_id} - Instagram media container creation failed")
-                await db.videos.update_one(
-                    {"id": video_id},
-                    {
-                        "$set": {
-                            "status": "completed",
-                            "video_url": video_url,
-                            "duration": video_result.get("duration", prompt.get("video_length", 30)) if video_result.get("success") else prompt.get("video_length", 30),
-                            "completed_at": completed_at,
-                            "caption_text": caption,
-                            "hashtags_used": hashtags,
-                            "instagram_post_id": None,
-                            "posted_at": None,
-                            "platform": "instagram"
-                        }
-                    }
-                )
         except Exception as ig_error:
-            logger.error(f"Video {video_id} - Instagram posting error: {ig_error}")
             # Still mark video as completed even if Instagram posting fails
-            await db.videos.update_one(
-                {"id": video_id},
-                {
-                    "$set": {
-                        "status": "completed",
-                        "video_url": video_url,
-                        "duration": video_result.get("duration", prompt.get("video_length", 30)) if video_result.get("success") else prompt.get("video_length", 30),
-                        "completed_at": completed_at,
-                        "caption_text": caption,
-                        "hashtags_used": hashtags,
-                        "instagram_post_id": None,
-                        "posted_at": None,
-                        "platform": "instagram"
-                    }
-                }
-            )
+            logger.error(f"Video {video_id} - Instagram posting error: {ig_error}")
         
-        # Update prompt status
-        await db.prompts.update_one(
-            {"id": prompt["id"]},
-            {"$set": {"status": "completed"}}
-        )
+        if not await update_video(video_id, prompt["user_id"], final_update, claim):
+            # Re-queued as stale and picked up elsewhere; that run owns the result
+            logger.warning(f"Video {video_id} - claim lost, discarding this run's result")
+            return
         
-        # Initialize performance metrics
-        await db.performance.insert_one({
-            "id": str(uuid.uuid4()),
-            "video_id": video_id,
-            "views": 0,
-            "likes": 0,
-            "shares": 0,
-            "comments": 0,
-            "watch_time_avg": 0.0,
-            "updated_at": completed_at
-        })
+        # Mark the prompt completed and initialize performance metrics concurrently
+        await asyncio.gather(
+            db.prompts.update_one(
+                {"id": prompt["id"]},
+                {"$set": {"status": "completed"}}
+            ),
+            db.performance.insert_one({
+                "id": _new_id(),
+                "video_id": video_id,
+                "views": 0,
+                "likes": 0,
+                "shares": 0,
+                "comments": 0,
+                "watch_time_avg": 0.0,
+                "updated_at": completed_at
+            })
+        )
+        forget_doc("prompts", prompt["id"])
         
         logger.info(f"Video {video_id} processing completed")
         
     except Exception as e:
         logger.error(f"Video generation failed for {video_id}: {e}")
-        await db.videos.update_one(
-            {"id": video_id},
-            {"$set": {"status": "failed"}}
-        )
+        await update_video(video_id, prompt["user_id"], {"status": "failed"}, claim)
+
+# ==================== VIDEO GENERATION QUEUE ====================
+
+# Video ids waiting for a worker. Jobs are claimed atomically from Mongo, so ids left
+# "queued" by a restart are re-enqueued on startup and several app processes can
+# drain the same backlog without processing a video twice. Workers stopped at shutdown
+# hand their video back; a claim older than VIDEO_CLAIM_TIMEOUT belongs to a process
+# that died mid-job and is re-queued by the periodic sweep. Each claim carries a token,
+# so a run whose claim was taken over can no longer write the video.
+VIDEO_WORKERS = int(os.environ.get('VIDEO_WORKERS', '4'))
+VIDEO_CLAIM_TIMEOUT = timedelta(minutes=int(os.environ.get('VIDEO_CLAIM_TIMEOUT_MINUTES', '30')))
+# The rest of the claim window is left for the caption and the Instagram post
+FAL_RESULT_TIMEOUT = VIDEO_CLAIM_TIMEOUT * 0.75
+video_queue: asyncio.Queue = asyncio.Queue()
+_video_worker_tasks: List[asyncio.Task] = []
+
+async def claim_video(video_id: str) -> Optional[dict]:
+    """Move a queued video to processing; None if another worker already claimed it"""
+    claim = secrets.token_hex(8)
+    video = await db.videos.find_one_and_update(
+        {"id": video_id, "status": "queued"},
+        {"$set": {"status": "processing", "claim": claim, "claimed_at": _utcnow()}},
+        projection={"_id": 0, "prompt_id": 1, "user_id": 1}
+    )
+    if video:
+        video["claim"] = claim
+        forget_doc("videos", video_id)
+        forget_dashboard(video["user_id"])
+    return video
+
+async def requeue_video(video_filter: dict) -> bool:
+    """Put a processing video matched by video_filter back in the queue"""
+    result = await db.videos.update_one(
+        {**video_filter, "status": "processing"},
+        {"$set": {"status": "queued"}, "$unset": {"claim": "", "claimed_at": ""}}
+    )
+    return result.modified_count > 0
+
+async def requeue_stale_claims():
+    """Re-queue videos whose worker died mid-run (or that predate claimed_at)"""
+    stale = {"$or": [
+        {"claimed_at": {"$lt": _utcnow() - VIDEO_CLAIM_TIMEOUT}},
+        {"claimed_at": {"$exists": False}}
+    ]}
+    async for video in db.videos.find({"status": "processing", **stale}, {"_id": 0, "id": 1}):
+        # Re-checked per video so only one process re-queues it
+        if await requeue_video({"id": video["id"], **stale}):
+            logger.warning(f"Video {video['id']} - re-queued stale processing claim")
+            video_queue.put_nowait(video["id"])
+
+async def sweep_stale_claims():
+    while True:
+        await asyncio.sleep(VIDEO_CLAIM_TIMEOUT.total_seconds() / 2)
+        try:
+            await requeue_stale_claims()
+        except Exception as e:
+            logger.error(f"Stale claim sweep failed: {e}")
+
+async def video_worker():
+    while True:
+        video_id = await video_queue.get()
+        video = None
+        try:
+            video = await claim_video(video_id)
+            if not video:
+                continue
+            prompt = await db.prompts.find_one({"id": video["prompt_id"]}, {"_id": 0})
+            if not prompt:
+                logger.error(f"Video {video_id} - prompt {video['prompt_id']} no longer exists")
+                await update_video(video_id, video["user_id"], {"status": "failed"}, video["claim"])
+                continue
+            await process_video_generation(video_id, prompt, video["claim"])
+        except asyncio.CancelledError:
+            # Shutting down mid-job: hand the video back for the next process to run
+            if video:
+                await requeue_video({"id": video_id, "claim": video["claim"]})
+                forget_doc("videos", video_id)
+                forget_dashboard(video["user_id"])
+            raise
+        except Exception as e:
+            logger.error(f"Video worker error for {video_id}: {e}")
+        finally:
+            video_queue.task_done()
 
 @api_router.get("/videos", response_model=List[VideoResponse])
 async def get_videos(current_user: dict = Depends(get_current_user), limit: int = 50):
-    videos = await db.videos.find(
+    # Streamed straight from the cursor; response_model only documents the shape
+    cursor = db.videos.find(
         {"user_id": current_user["id"]},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(limit)
-    return [VideoResponse(**v) for v in videos]
+        VIDEO_LIST_PROJECTION
+    ).sort("created_at", -1).limit(limit).batch_size(limit)
+    return StreamingResponse(json_array(cursor, VIDEO_LIST_DEFAULTS), media_type="application/json")
+
+@api_router.get("/videos.ndjson", response_class=StreamingResponse)
+async def stream_videos(current_user: dict = Depends(get_current_user), limit: int = 50):
+    """Stream videos as newline-delimited JSON without buffering the whole list"""
+    cursor = db.videos.find(
+        {"user_id": current_user["id"]},
+        VIDEO_LIST_PROJECTION
+    ).sort("created_at", -1).limit(limit).batch_size(limit)
+    return StreamingResponse(ndjson_lines(cursor, VIDEO_LIST_DEFAULTS), media_type="application/x-ndjson")
 
 @api_router.get("/videos/{video_id}", response_model=VideoResponse)
 async def get_video(video_id: str, current_user: dict = Depends(get_current_user)):
-    video = await db.videos.find_one(
-        {"id": video_id, "user_id": current_user["id"]},
-        {"_id": 0}
-    )
+    video = await find_owned_doc("videos", video_id, current_user["id"])
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
-    return VideoResponse(**video)
+    return VideoResponse.model_construct(**video)
 
 
 # ==================== PERFORMANCE ROUTES ====================
 
 @api_router.get("/performance/{video_id}", response_model=PerformanceMetrics)
 async def get_performance(video_id: str, current_user: dict = Depends(get_current_user)):
-    # Verify video belongs to user
-    video = await db.videos.find_one({"id": video_id, "user_id": current_user["id"]})
-    if not video:
+    owner = _VIDEO_OWNER.get(video_id)
+    if owner is not None and owner != current_user["id"]:
+        raise HTTPException(status_code=404, detail="Video not found")
+    cached = _PERF_CACHE.get(video_id)
+    if owner is not None and cached is not None:
+        return PerformanceMetrics.model_construct(**cached)
+    
+    # Verify video belongs to user and fetch its metrics in a single round-trip
+    result = await aggregate_list(db.videos, [
+        {"$match": {"id": video_id, "user_id": current_user["id"]}},
+        {"$limit": 1},
+        {"$lookup": {
+            "from": "performance",
+            "localField": "id",
+            "foreignField": "video_id",
+            "as": "metrics"
+        }},
+        {"$project": {"_id": 0, "metrics": 1}}
+    ], 1)
+    if not result:
         raise HTTPException(status_code=404, detail="Video not found")
+    _VIDEO_OWNER[video_id] = current_user["id"]
     
-    metrics = await db.performance.find_one({"video_id": video_id}, {"_id": 0})
+    metrics = result[0]["metrics"]
     if not metrics:
         raise HTTPException(status_code=404, detail="Performance metrics not found")
-    return PerformanceMetrics(**metrics)
+    _PERF_CACHE[video_id] = metrics[0]
+    return PerformanceMetrics.model_construct(**metrics[0])
+
+async def refresh_user_totals(user_id: str) -> dict:
+    """Backfill a user's denormalized view/like totals from their performance metrics"""
+    result = await aggregate_list(db.videos, [
+        {"$match": {"user_id": user_id}},
+        # Carry only the join key and the two summed metrics through the pipeline
+        {"$project": {"_id": 0, "id": 1}},
+        {"$lookup": {
+            "from": "performance",
+            "localField": "id",
+            "foreignField": "video_id",
+            "as": "p"
+        }},
+        {"$project": {"views": "$p.views", "likes": "$p.likes"}},
+        {"$group": {
+            "_id": None,
+            "total_views": {"$sum": {"$sum": "$views"}},
+            "total_likes": {"$sum": {"$sum": "$likes"}}
+        }}
+    ], 1)
+    totals = {
+        "total_views": result[0]["total_views"] if result else 0,
+        "total_likes": result[0]["total_likes"] if result else 0
+    }
+    # Only seed missing totals; once present they are moved by $inc, and a blind
+    # $set here could overwrite an increment that landed after the aggregation
+    await db.users.update_one({"id": user_id, "total_views": {"$exists": False}}, {"$set": totals})
+    return totals
+
+@api_router.patch("/performance/bulk")
+async def bulk_update_performance(updates: List[PerformanceBulkUpdate], current_user: dict = Depends(get_current_user)):
+    """Apply metric updates for many videos concurrently"""
+    if not updates:
+        return {"matched_count": 0, "modified_count": 0}
+    
+    # Verify all videos belong to user
+    video_ids = {u.video_id for u in updates}
+    owned = await db.videos.count_documents({"id": {"$in": list(video_ids)}, "user_id": current_user["id"]})
+    if owned != len(video_ids):
+        raise HTTPException(status_code=404, detail="Video not found")
+    
+    # Each write returns the document it replaced, so the user's running totals move by
+    # exactly what changed - even when a video repeats or another PATCH lands in between
+    updated_at = _iso_utcnow()
+    updates_data = [
+        (u.video_id, {**u.model_dump(exclude={"video_id"}, exclude_none=True), "updated_at": updated_at})
+        for u in updates
+    ]
+    previous = await asyncio.gather(*(
+        db.performance.find_one_and_update(
+            {"video_id": video_id},
+            {"$set": update_data},
+            projection={"_id": 0, "views": 1, "likes": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        for video_id, update_data in updates_data
+    ))
+    for video_id in video_ids:
+        _PERF_CACHE.pop(video_id, None)
+    
+    deltas = {
+        f"total_{field}": sum(
+            update_data[field] - before.get(field, 0)
+            for (_, update_data), before in zip(updates_data, previous)
+            if before and field in update_data
+        )
+        for field in ("views", "likes")
+    }
+    if any(deltas.values()):
+        await db.users.update_one(
+            {"id": current_user["id"], "total_views": {"$exists": True}},
+            {"$inc": deltas}
+        )
+    forget_dashboard(current_user["id"])
+    matched = sum(1 for before in previous if before)
+    return {"matched_count": matched, "modified_count": matched}
 
 @api_router.patch("/performance/{video_id}", response_model=PerformanceMetrics)
 async def update_performance(video_id: str, update: PerformanceUpdate, current_user: dict = Depends(get_current_user)):
     # Verify video belongs to user
-    video = await db.videos.find_one({"id": video_id, "user_id": current_user["id"]})
-    if not video:
+    if not await owns_video(video_id, current_user["id"]):
         raise HTTPException(status_code=404, detail="Video not found")
     
-    update_data = {k: v for k, v in update.model_dump().items() if v is not None}
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data = update.model_dump(exclude_none=True)
+    update_data["updated_at"] = _iso_utcnow()
     
-    await db.performance.update_one(
+    # Take the previous values so the user's running totals can be moved by the difference
+    previous = await db.performance.find_one_and_update(
         {"video_id": video_id},
-        {"$set": update_data}
+        {"$set": update_data},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
     )
+    if not previous:
+        raise HTTPException(status_code=404, detail="Performance metrics not found")
     
-    metrics = await db.performance.find_one({"video_id": video_id}, {"_id": 0})
-    return PerformanceMetrics(**metrics)
+    deltas = {
+        f"total_{field}": update_data[field] - previous.get(field, 0)
+        for field in ("views", "likes")
+        if field in update_data
+    }
+    if any(deltas.values()):
+        await db.users.update_one(
+            {"id": current_user["id"], "total_views": {"$exists": True}},
+            {"$inc": deltas}
+        )
+    forget_dashboard(current_user["id"])
+    metrics = _PERF_CACHE[video_id] = {**previous, **update_data}
+    return PerformanceMetrics.model_construct(**metrics)
 
 
 # ==================== DASHBOARD ROUTES ====================
 
 @api_router.get("/dashboard/stats", response_model=DashboardStats)
 async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
-    user_id = current_user["id"]
+    """Per-user dashboard totals.
     
-    total_prompts = await db.prompts.count_documents({"user_id": user_id})
-    total_videos = await db.videos.count_documents({"user_id": user_id})
-    videos_processing = await db.videos.count_documents({"user_id": user_id, "status": {"$in": ["queued", "processing"]}})
-    videos_completed = await db.videos.count_documents({"user_id": user_id, "status": "completed"})
+    Counts are exact index counts (user_id-prefixed indexes) but the result is
+    cached for up to 45s, so a write from another worker may take that long to
+    show. estimated_document_count is not used: it ignores the user_id filter.
+    """
+    user_id = current_user["id"]
+    cached = _DASHBOARD_CACHE.get(user_id)
+    if cached is not None:
+        return cached
     
-    # Aggregate performance metrics
-    video_ids = await db.videos.distinct("id", {"user_id": user_id})
+    # Video counts reduced server-side in one $group; view/like totals are
+    # denormalized onto the user document
     pipeline = [
-        {"$match": {"video_id": {"$in": video_ids}}},
+        {"$match": {"user_id": user_id}},
         {"$group": {
             "_id": None,
-            "total_views": {"$sum": "$views"},
-            "total_likes": {"$sum": "$likes"}
+            "total_videos": {"$sum": 1},
+            "videos_processing": {"$sum": {
+                "$cond": [{"$in": ["$status", ["queued", "processing"]]}, 1, 0]
+            }},
+            "videos_completed": {"$sum": {
+                "$cond": [{"$eq": ["$status", "completed"]}, 1, 0]
+            }}
         }}
     ]
-    agg_result = await db.performance.aggregate(pipeline).to_list(1)
-    
-    total_views = agg_result[0]["total_views"] if agg_result else 0
-    total_likes = agg_result[0]["total_likes"] if agg_result else 0
+    total_prompts, agg_result, user = await asyncio.gather(
+        db.prompts.count_documents({"user_id": user_id}),
+        aggregate_list(db.videos, pipeline, 1),
+        db.users.find_one({"id": user_id}, {"_id": 0, "total_views": 1, "total_likes": 1})
+    )
+    totals = agg_result[0] if agg_result else {}
+    if not user or "total_views" not in user:
+        # Accounts created before the totals existed are backfilled on first view
+        user = await refresh_user_totals(user_id)
     
-    return DashboardStats(
+    stats = DashboardStats(
         total_prompts=total_prompts,
-        total_videos=total_videos,
-        videos_processing=videos_processing,
-        videos_completed=videos_completed,
-        total_views=total_views,
-        total_likes=total_likes
+        total_videos=totals.get("total_videos", 0),
+        videos_processing=totals.get("videos_processing", 0),
+        videos_completed=totals.get("videos_completed", 0),
+        total_views=user.get("total_views", 0),
+        total_likes=user.get("total_likes", 0)
     )
+    _DASHBOARD_CACHE[user_id] = stats
+    return stats
 
 @api_router.get("/dashboard/recent-activity")
 async def get_recent_activity(current_user: dict = Depends(get_current_user)):
     user_id = current_user["id"]
     
-    # Get recent prompts
-    recent_prompts = await db.prompts.find(
-        {"user_id": user_id},
-        {"_id": 0, "id": 1, "niche": 1, "platform": 1, "status": 1, "created_at": 1}
-    ).sort("created_at", -1).to_list(5)
-    
-    # Get recent videos
-    recent_videos = await db.videos.find(
-        {"user_id": user_id},
-        {"_id": 0, "id": 1, "status": 1, "created_at": 1, "video_url": 1}
-    ).sort("created_at", -1).to_list(5)
+    # Get recent prompts and videos concurrently
+    recent_prompts, recent_videos = await asyncio.gather(
+        db.prompts.find(
+            {"user_id": user_id},
+            {"_id": 0, "id": 1, "niche": 1, "platform": 1, "status": 1, "created_at": 1}
+        ).sort("created_at", -1).limit(5).to_list(5),
+        db.videos.find(
+            {"user_id": user_id},
+            {"_id": 0, "id": 1, "status": 1, "created_at": 1, "video_url": 1}
+        ).sort("created_at", -1).limit(5).to_list(5)
+    )
     
     return {
         "recent_prompts": recent_prompts,
@@ -1283,6 +1787,7 @@ async def get_recent_activity(current_user: dict = Depends(get_current_user)):
 @api_router.get("/instagram/config")
 async def get_instagram_config(current_user: dict = Depends(get_current_user)):
     """Get current Instagram API configuration status"""
+    await instagram_service.adopt_shared_business_account_id()
     return {
         "mock_mode": instagram_service.mock_mode,
         "has_access_token": bool(instagram_service.access_token),
@@ -1291,9 +1796,41 @@ async def get_instagram_config(current_user: dict = Depends(get_current_user)):
         "api_version": instagram_service.api_version
     }
 
+_IG_ID_RE = re.compile(r'INSTAGRAM_BUSINESS_ACCOUNT_ID=".*"')
+
+def persist_account_id_to_env(account_id: str):
+    """Rewrite the INSTAGRAM_BUSINESS_ACCOUNT_ID line in .env (blocking - run in a thread)"""
+    env_path = ROOT_DIR / '.env'
+    env_content = env_path.read_text()
+    env_content = _IG_ID_RE.sub(f'INSTAGRAM_BUSINESS_ACCOUNT_ID="{account_id}"', env_content)
+    env_path.write_text(env_content)
+
+async def acquire_lease(name: str, seconds: int) -> Optional[str]:
+    """Take a cross-worker lock that expires on its own; returns the owner token, or None if someone else holds it"""
+    now = _utcnow()
+    owner = secrets.token_hex(8)
+    try:
+        # Matches only an expired lease; a live one makes the upsert collide on _id
+        await db.app_config.update_one(
+            {"_id": f"lock:{name}", "expires_at": {"$lt": now}},
+            {"$set": {"expires_at": now + timedelta(seconds=seconds), "owner": owner}},
+            upsert=True
+        )
+        return owner
+    except DuplicateKeyError:
+        return None
+
+async def release_lease(name: str, owner: str):
+    # Only the holder may release; an expired lease may already belong to someone else
+    await db.app_config.delete_one({"_id": f"lock:{name}", "owner": owner})
+
 @api_router.post("/instagram/fetch-account-id")
 async def fetch_instagram_account_id(current_user: dict = Depends(get_current_user)):
     """Manually fetch Instagram Business Account ID"""
+    # One refresh at a time across all workers - repeat clicks shouldn't race on .env
+    lease = await acquire_lease("ig_fetch_id", IG_FETCH_LEASE_SECONDS)
+    if not lease:
+        return {"success": False, "error": "in progress"}
     try:
         account_id = await instagram_service._fetch_business_account_id()
         
@@ -1302,21 +1839,10 @@ async def fetch_instagram_account_id(current_user: dict = Depends(get_current_us
             instagram_service.business_account_id = account_id
             instagram_service.mock_mode = False
             
-            # Update .env file
-            env_path = ROOT_DIR / '.env'
-            with open(env_path, 'r') as f:
-                env_content = f.read()
-            
-            # Replace the INSTAGRAM_BUSINESS_ACCOUNT_ID line
-            import re
-            env_content = re.sub(
-                r'INSTAGRAM_BUSINESS_ACCOUNT_ID=".*"',
-                f'INSTAGRAM_BUSINESS_ACCOUNT_ID="{account_id}"',
-                env_content
-            )
-            
-            with open(env_path, 'w') as f:
-                f.write(env_content)
+            # Other workers adopt the stored ID before their next post; writing it back to
+            # .env is opt-in so concurrent workers don't race on the file
+            if os.environ.get('PERSIST_IG_ID'):
+                await asyncio.to_thread(persist_account_id_to_env, account_id)
             
             logger.info(f"Instagram Business Account ID updated: {account_id}")
             
@@ -1336,6 +1862,8 @@ async def fetch_instagram_account_id(current_user: dict = Depends(get_current_us
             "success": False,
             "error": str(e)
         }
+    finally:
+        await release_lease("ig_fetch_id", lease)
 
 
 # ==================== HEALTH CHECK ====================
@@ -1346,14 +1874,14 @@ async def root():
 
 @api_router.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat()}
+    return {"status": "healthy", "timestamp": _iso_utcnow()}
 
 
 # Include the router in the main app
 app.include_router(api_router)
 
 # Mount static files for videos
-app.mount("/videos", StaticFiles(directory=str(VIDEOS_DIR)), name="videos")
+app.mount("/videos", StaticFiles(directory=str(VIDEOS_DIR), check_dir=False), name="videos")
 
 app.add_middleware(
     CORSMiddleware,
@@ -1363,8 +1891,94 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+async def ensure_performance_index():
+    # One metrics document per video; replace the earlier non-unique index if present
+    indexes = await db.performance.index_information()
+    video_id_index = indexes.get("video_id_1")
+    if video_id_index and video_id_index.get("unique"):
+        return
+    # Every worker runs this at startup; only one may swap the index over
+    lease = await acquire_lease("performance_index", 120)
+    if not lease:
+        return
+    try:
+        await migrate_performance_index(video_id_index)
+    finally:
+        await release_lease("performance_index", lease)
+
+async def migrate_performance_index(video_id_index: Optional[dict]):
+    # Older deployments may already hold several metrics rows for one video. Keep the
+    # plain index (and start up) until they are cleaned out rather than drop it and fail.
+    duplicate = await aggregate_list(db.performance, [
+        {"$group": {"_id": "$video_id", "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+        {"$limit": 1}
+    ], 1)
+    if duplicate:
+        logger.error(f"Duplicate performance rows for video {duplicate[0]['_id']}; keeping non-unique video_id index")
+        await db.performance.create_index("video_id")
+        return
+    
+    if video_id_index:
+        try:
+            await db.performance.drop_index("video_id_1")
+        except OperationFailure as e:
+            # Already gone, e.g. dropped by a holder whose lease ran out
+            if e.code != 27:  # IndexNotFound
+                raise
+    try:
+        await db.performance.create_index("video_id", unique=True)
+    except OperationFailure as e:
+        # A duplicate written since the check above - fall back to the plain index
+        logger.error(f"Could not build unique performance index: {e}")
+        await db.performance.create_index("video_id")
+
+@app.on_event("startup")
+async def ensure_indexes():
+    await asyncio.gather(
+        db.users.create_index("email", unique=True),
+        db.users.create_index("id", unique=True),
+        db.projects.create_index([("user_id", 1), ("created_at", -1)]),
+        db.prompts.create_index([("user_id", 1), ("created_at", -1)]),
+        db.prompts.create_index([("id", 1), ("user_id", 1)]),
+        db.videos.create_index([("user_id", 1), ("created_at", -1)]),
+        db.videos.create_index([("user_id", 1), ("status", 1)]),
+        db.videos.create_index([("id", 1), ("user_id", 1)]),
+        db.videos.create_index([("status", 1), ("claimed_at", 1)]),
+        ensure_performance_index(),
+        db.prompt_cache.create_index("ts", expireAfterSeconds=PROMPT_CACHE_TTL_SECONDS)
+    )
+
+@app.on_event("startup")
+async def warm_up():
+    # Open the Mongo pool and the Instagram session now rather than on the first request
+    VIDEOS_DIR.mkdir(exist_ok=True)
+    await asyncio.gather(db.command("ping"), instagram_service._get_session())
+    
+    # With a token but no configured ID, resolve it (stored copy, else Graph API) so
+    # posting leaves mock mode instead of silently mocking every reel
+    if instagram_service.access_token and not instagram_service.business_account_id:
+        if await instagram_service._resolve_business_account_id():
+            instagram_service.mock_mode = False
+
+@app.on_event("startup")
+async def start_video_workers():
+    _video_worker_tasks.extend(asyncio.create_task(video_worker()) for _ in range(VIDEO_WORKERS))
+    # Pick up jobs that were queued when the previous process stopped
+    async for video in db.videos.find({"status": "queued"}, {"_id": 0, "id": 1}):
+        video_queue.put_nowait(video["id"])
+    # Then jobs left processing by a process that died; re-queued ones enqueue themselves
+    await requeue_stale_claims()
+    _video_worker_tasks.append(asyncio.create_task(sweep_stale_claims()))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
+    for task in _video_worker_tasks:
+        task.cancel()
+    # Let interrupted workers hand their videos back before the client closes
+    await asyncio.gather(*_video_worker_tasks, return_exceptions=True)
+    await client.close()
+    await instagram_service.close()
+    BCRYPT_EXECUTOR.shutdown(wait=False)
 # To run the app, use: uvicorn backend.server:app --host 0.0.0 --port 8000
 